@@ -1,7 +1,12 @@
 from __future__ import annotations
+import asyncio
 import os
+from collections import deque
+from functools import lru_cache
 from time import monotonic
 
+from rich.style import Style
+from rich.text import Text
 from textual.app import App, ComposeResult
 from textual.containers import Container, Horizontal, Vertical
 from textual.widgets import Static, Input, Label, Button
@@ -11,10 +16,34 @@ from textual.widgets import RadioButton, RadioSet
 
 from exercise import Exercise, TwoXTwoExercise, OneXTwoExercise, TypeExerciseGen, ReprExerciseGen, ExerciseGen, ExerciseSession
 
-# Ensure we are in the correct dir and related dir is ready
-FILE_DIR = os.path.dirname(__file__)
-os.makedirs(os.path.join(FILE_DIR, "_data"), exist_ok=True)
-os.chdir(FILE_DIR)
+# All data files are stored under the _data dir next to this file
+FILE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_DATA_DIR_READY = False
+
+
+def _ensure_data_dir() -> str:
+    """Create the _data dir on first use and return the dir holding it"""
+    global _DATA_DIR_READY
+    if not _DATA_DIR_READY:
+        os.makedirs(os.path.join(FILE_DIR, "_data"), exist_ok=True)
+        _DATA_DIR_READY = True
+    return FILE_DIR
+
+
+@lru_cache(maxsize=4096)
+def _fmt_hms(seconds: int) -> str:
+    """Format seconds as HH:MM:SS, cached since the countdown repeats them"""
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+# Styles of the status line, prebuilt so it is assembled without markup
+_S_GREEN = Style(bold=True, color="green")
+_S_RED = Style(bold=True, color="red")
+_S_WHITE = Style(bold=True, color="white")
+_S_YELLOW = Style(bold=True, color="yellow")
 
 
 class ExerciseWidget(Container):
@@ -24,6 +53,7 @@ class ExerciseWidget(Container):
 
     The ? will be converted into an input asking for user input
 
+    The widget is persistent, call set_exercise to show another exercise
     """
     DEFAULT_CSS = """
     ExerciseWidget {
@@ -53,23 +83,34 @@ class ExerciseWidget(Container):
     }
     """
 
-    def __init__(self, exercise: str, *args, **kwargs) -> None:
-        self.ex_exercise = exercise.split("?")
-        assert len(self.ex_exercise) == 2  # should have one and only one ?
+    def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        # The children are created once and reused for every exercise, so
+        # switching exercises only updates them instead of re-mounting
+        self.left = Static("", id="left")
+        self.input = Input(id="mid")
+        self.right = Static("", id="right")
 
     def compose(self) -> ComposeResult:
-        if self.ex_exercise[0]:
-            yield Static(self.ex_exercise[0])
-        self.input = Input()
+        yield self.left
         yield self.input
-        if self.ex_exercise[1]:
-            yield Static(self.ex_exercise[1])
+        yield self.right
 
     def on_mount(self):
         self.input.styles.border = "none", "orange"
         self.input.focus()
 
+    def set_exercise(self, exercise: str) -> None:
+        left, sep, right = exercise.partition("?")
+        if not sep:
+            raise ValueError(f"No ? placeholder in exercise: {exercise}")
+        self.left.update(left)
+        self.right.update(right)
+        self.left.display = bool(left)
+        self.right.display = bool(right)
+        self.input.value = ""
+        self.input.focus()
+
     def fetch_value(self, clear=False) -> str:
         result = self.input.value
         if clear:
@@ -106,6 +147,11 @@ class ExerciseUI(Container):
 
     """
 
+    # exercises are generated ahead of time in the background and the queue
+    # is refilled to EX_QUEUE_SIZE when it drops below EX_QUEUE_LOW
+    EX_QUEUE_SIZE = 32
+    EX_QUEUE_LOW = 8
+
     class Completed(Message):
         def __init__(self, session: ExerciseSession) -> None:
             super().__init__()
@@ -125,7 +171,19 @@ class ExerciseUI(Container):
         self.driving_mode, self.driving_count = driving_options
         assert self.driving_mode in ["time", "count"]
         self.driving_remaining = self.driving_count
-        self.session = ExerciseSession(FILE_DIR)
+        # in count mode at least driving_count results will be recorded
+        capacity = self.driving_count if self.driving_mode == "count" else 0
+        self.session = ExerciseSession(_ensure_data_dir(), capacity)
+
+        # status updates are coalesced, see _request_status_update
+        self._status_dirty = False
+        self._status_scheduled = False
+        self._status_key = None
+
+        self._verdict: str | None = None  # "correct" or "incorrect" class
+
+        self._ex_queue: deque[Exercise] = deque()
+        self._refill_task: asyncio.Task | None = None
 
         self.start_time = monotonic()
         super().__init__(*args, **kwargs)
@@ -138,67 +196,122 @@ class ExerciseUI(Container):
                 id="title")
             self.status = Static(id="status")
             yield self.status
+            self.ex = ExerciseWidget()
+            yield self.ex
 
     def new_exercise(self):
-        if hasattr(self, "ex"):
-            self.ex.remove()
-        self.exercise = self.gen.get_an_exercise()
-        self.ex = ExerciseWidget(str(self.exercise))
-        self.ex_container.mount(self.ex)
+        if self._ex_queue:
+            self.exercise = self._ex_queue.popleft()
+        else:
+            self.exercise = self.gen.get_an_exercise()
+        if len(self._ex_queue) < self.EX_QUEUE_LOW:
+            self._schedule_refill()
+        self.ex.set_exercise(str(self.exercise))
         self.start_time = monotonic()
 
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while len(self._ex_queue) < self.EX_QUEUE_SIZE:
+            self._ex_queue.append(self.gen.get_an_exercise())
+            await asyncio.sleep(0)  # yield to keep the UI responsive
+
     def on_mount(self):
         if self.driving_mode == "time":
+            # remaining time is derived from the clock, the interval is only
+            # used to redraw, so a delayed or skipped tick never drifts
+            self._deadline = monotonic() + self.driving_count
             self.set_interval(1, self.time_tick)
-        self.update_status()
+        self._request_status_update()
         self.new_exercise()
 
+    def on_unmount(self):
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+
     def time_tick(self):
-        self.driving_remaining -= 1
-        self.update_status()
+        # round rather than truncate, ticks may fire slightly early or late
+        remaining = round(self._deadline - monotonic())
+        self.driving_remaining = max(0, remaining)
+        self._request_status_update()
         if self.driving_remaining <= 0:
             self.done()
 
+    def _request_status_update(self):
+        """Mark the status as dirty and schedule a single refresh, so that
+        bursts of requests (e.g. fast typing) result in one update only
+        """
+        self._status_dirty = True
+        if not self._status_scheduled:
+            self._status_scheduled = True
+            self.set_timer(0.05, self._flush_status)
+
+    def _flush_status(self):
+        self._status_scheduled = False
+        if self._status_dirty:
+            self._status_dirty = False
+            self.update_status()
+
     def update_status(self):
-        status = f" [bold green]✓ {self.session.correct}[/]"
-        status += f"  [bold red] x {self.session.incorrect}[/]"
         if self.driving_mode == "count":
             remain = str(self.driving_remaining)
         else:
-            minutes, seconds = divmod(self.driving_remaining, 60)
-            hours, minutes = divmod(minutes, 60)
-            remain = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        status += f"      [bold white] Remaining: [bold yellow]{remain}[/]"
-        self.status.update(status)
+            remain = _fmt_hms(self.driving_remaining)
+        key = (self.session.correct, self.session.incorrect, remain)
+        if key == self._status_key:
+            return
+        self._status_key = key
+        self.status.update(
+            Text.assemble(
+                " ",
+                (f"✓ {self.session.correct}", _S_GREEN),
+                "  ",
+                (f" x {self.session.incorrect}", _S_RED),
+                "      ",
+                (" Remaining: ", _S_WHITE),
+                (remain, _S_YELLOW),
+            ))
 
     def done(self):
         self.session.store_results()
         self.post_message(self.Completed(self.session))
 
+    def _set_verdict(self, verdict: str):
+        """Swap the correct/incorrect class, only touching it on a change"""
+        if verdict == self._verdict:
+            return
+        if self._verdict:
+            self.remove_class(self._verdict)
+        self.add_class(verdict)
+        self._verdict = verdict
+
     def on_key(self, e: events.Key):
         if e.key == "ctrl+d":
             self.done()
             return
         if e.key != "enter":
             return
-        result, msg = self.exercise.check(self.ex.fetch_value(clear=True))
-        ms_elapsed = int((monotonic() - self.start_time) * 1000)
+        # this runs for every answer, bind what is used more than once
+        exercise = self.exercise
+        session = self.session
+        result, msg = exercise.check(self.ex.fetch_value(clear=True))
+        now = monotonic()
+        ms_elapsed = int((now - self.start_time) * 1000)
         if result != Exercise.Correct:
-            self.remove_class("correct")
-            self.add_class("incorrect")
+            self._set_verdict("incorrect")
             if result == Exercise.Invalid:
-                self.start_time = monotonic()
+                self.start_time = now
             elif result == Exercise.Error:
-                self.session.finish_an_exercise(self.exercise, False,
-                                                ms_elapsed)
+                session.finish_an_exercise(exercise, False, ms_elapsed)
         else:
-            self.remove_class("incorrect")
-            self.add_class("correct")
-            self.session.finish_an_exercise(self.exercise, True, ms_elapsed)
+            self._set_verdict("correct")
+            session.finish_an_exercise(exercise, True, ms_elapsed)
             self.new_exercise()
             if self.driving_mode == "count":
                 self.driving_remaining -= 1
-        self.update_status()
+        self._request_status_update()
         if self.driving_remaining <= 0:
             self.done()
 
@@ -398,5 +511,6 @@ class MainApp(App):
         return
 
 
-app = MainApp()
-app.run()
\ No newline at end of file
+if __name__ == "__main__":
+    app = MainApp()
+    app.run()
@@ -1,8 +1,12 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from random import randint, choice
-from datetime import datetime
+from array import array
+from random import Random
+from functools import lru_cache
+from itertools import islice
 import os
+import sys
+import time
 
 #------------------------------------------------------------------
 # Helpers
@@ -10,8 +14,34 @@ import os
 
 _ALL_EXERCISES = {}
 
+# A single generator for all exercises, its bound methods save the lookups
+_RNG = Random()
+_choice = _RNG.choice
+_randint = _RNG.randint
+
+_TODAY_CACHE = {"day": None, "date": None}
+
+
+def _today() -> str:
+    """Today's date as YYYY-MM-DD, the same str object is shared for a day"""
+    now = time.localtime()
+    day = (now.tm_year, now.tm_yday)
+    if _TODAY_CACHE["day"] != day:
+        _TODAY_CACHE["day"] = day
+        _TODAY_CACHE["date"] = sys.intern(time.strftime("%Y-%m-%d", now))
+    return _TODAY_CACHE["date"]
+
 
 def register_exercise_type(ex_type):
+    # Exercise is not an ABC to keep instantiation cheap, so check here that
+    # the type implements what it should
+    if "TYPE" not in vars(ex_type):
+        raise TypeError(f"{ex_type.__name__} does not define TYPE")
+    for name in ("__str__", "get_repr", "check"):
+        if getattr(ex_type, name) is getattr(Exercise, name):
+            raise TypeError(f"{ex_type.__name__} does not implement {name}")
+    # TYPE is stored with every result, intern it so they share one object
+    ex_type.TYPE = sys.intern(ex_type.TYPE)
     _ALL_EXERCISES[ex_type.TYPE] = ex_type
 
 
@@ -20,44 +50,83 @@ def get_all_exercise_types():
 
 
 def create_exercise(ty: str, strrepr: str) -> Exercise:
-    assert ty in _ALL_EXERCISES
-    return _ALL_EXERCISES[ty](strrepr)
+    cls = _ALL_EXERCISES.get(ty)
+    if cls is None:
+        raise KeyError(ty)
+    return cls(strrepr)
 
 
-def gen_math_int(digits: int, min: int = None, max: int = None) -> int:
-    """Get an integer with number of digits for math exercises in the region
+def _append_csv(path: str, header: str, payload: str) -> None:
+    """Append payload to a CSV file, starting with header if it is new
 
-    NOTE: Below numbers will never appear since they are too easy to calc
-
-    0, 1 for 1-digit interger
-    Any number which is end with 0, i.e. divisible by 10
-    All 1 numbers, e.g. 11, 111, etc.
+    It is written with one call on a binary file with a large buffer, which
+    skips the text encoding layer. A file opened for appending is positioned
+    at its end, so tell() == 0 means it needs the header
     """
+    with open(path, "ab", buffering=1 << 20) as f:
+        if f.tell() == 0:
+            payload = header + payload
+        f.write(payload.encode("utf-8"))
+
+
+_POW10 = tuple(10**i for i in range(20))
+_ALL_ONES = tuple(_POW10[i] // 9 for i in range(20))  # 0, 1, 11, 111, ...
+
+
+def _int_range(digits: int, min: int = None,
+               max: int = None) -> tuple[int, int, int]:
+    """The (low, high, all_ones) bounds gen_math_int draws from"""
     if digits == 1:
-        return randint(2, 9)
-    l = 1
-    for _ in range(digits - 1):
-        l *= 10
+        return 2, 9, 1
+    if digits < len(_POW10):
+        l = _POW10[digits - 1]
+        h = _POW10[digits] - 1
+        all_ones = _ALL_ONES[digits]
+    else:  # past the tables
+        l = 10**(digits - 1)
+        h = 10**digits - 1
+        all_ones = h // 9
     if min is not None and min > l:
         l = min
-    h = l * 10 - 1
     if max is not None and max < h:
         h = max
+    return l, h, all_ones
+
+
+# Ranges smaller than this are sampled from a cached pool of the valid
+# integers, larger ones use a rejection loop to keep memory bounded
+_POOL_MAX_RANGE = 5000
 
-    all_ones = 1
-    for _ in range(digits - 1):
-        all_ones = all_ones * 10 + 1
 
-    def _is_ok(r: int) -> bool:
-        if r % 10 == 0:
-            return False
-        if r == all_ones:
-            return False
-        return True
+@lru_cache(maxsize=32)
+def _valid_pool(digits: int,
+                min: int = None,
+                max: int = None) -> tuple[int, ...]:
+    """All the integers gen_math_int could return for the given arguments
+
+    It is computed only once per arguments so that generating is a single
+    choice() instead of a rejection loop. Only meant for small ranges, see
+    _POOL_MAX_RANGE
+    """
+    l, h, all_ones = _int_range(digits, min, max)
+    return tuple(r for r in range(l, h + 1) if r % 10 != 0 and r != all_ones)
+
 
-    n = randint(l, h)
-    while not _is_ok(n):
-        n = randint(l, h)
+def gen_math_int(digits: int, min: int = None, max: int = None) -> int:
+    """Get an integer with number of digits for math exercises in the region
+
+    NOTE: Below numbers will never appear since they are too easy to calc
+
+    0, 1 for 1-digit interger
+    Any number which is end with 0, i.e. divisible by 10
+    All 1 numbers, e.g. 11, 111, etc.
+    """
+    l, h, all_ones = _int_range(digits, min, max)
+    if h - l < _POOL_MAX_RANGE:
+        return _choice(_valid_pool(digits, min, max))
+    n = _randint(l, h)
+    while n % 10 == 0 or n == all_ones:
+        n = _randint(l, h)
     return n
 
 
@@ -66,10 +135,16 @@ def gen_math_int(digits: int, min: int = None, max: int = None) -> int:
 #------------------------------------------------------------------
 
 
-class Exercise(ABC):
+class Exercise:
     """Abstract base class for all exercises
+
+    It is not an ABC as exercises are created for every question, the
+    abstract methods are checked by register_exercise_type instead
     """
 
+    # subclasses declare their fields as slots too
+    __slots__ = ()
+
     # Every Exercise type should have a static TYPE and register it so
     # that it could be created by factory
     TYPE = "Exercise"
@@ -85,13 +160,12 @@ class Exercise(ABC):
         """It should be able to create from nothing or a string repr
         """
 
-    @abstractmethod
     def __str__(self) -> str:
         """It should returns something like 16 x ? = 96 where ? is a placeholder
         to get user input
         """
+        raise NotImplementedError
 
-    @abstractmethod
     def get_repr(self) -> str:
         """The unique representation for the exercise. 
         
@@ -101,12 +175,13 @@ class Exercise(ABC):
 
         The constructor could use repr to create a new Exercise
         """
+        raise NotImplementedError
 
-    @abstractmethod
     def check(self, input: str) -> tuple[int, str | None]:
         """Check user's input vs. answer. The 1st element should be one of
         Correct, Invalid or Error, and second is optional message 
         """
+        raise NotImplementedError
 
 
 class IntExercise(Exercise):
@@ -115,19 +190,27 @@ class IntExercise(Exercise):
 
     DESC = "Abstract Type of Exercises Related to Integer Arithmetic"
 
+    __slots__ = ("answer", )
+
     def __init__(self, strrepr=None) -> None:
         super().__init__(strrepr)
         self.answer = None
 
     def check(self, input: str) -> tuple[int, str | None]:
+        # validate up front instead of relying on int() raising, typos are
+        # common. An optional sign followed by decimal digits is accepted
+        s = input.strip()
+        digits = s[1:] if s[:1] in ("-", "+") else s
+        if not digits.isdecimal():
+            return Exercise.Invalid, f"{input} is NOT an integer!"
         try:
-            x = int(input)
-            if x != self.answer:
-                return Exercise.Error, f"{x} is Incorrect!"
-            else:
-                return Exercise.Correct, None
-        except:
+            x = int(s)
+        except ValueError:  # e.g. over the integer string conversion limit
             return Exercise.Invalid, f"{input} is NOT an integer!"
+        if x != self.answer:
+            return Exercise.Error, f"{x} is Incorrect!"
+        else:
+            return Exercise.Correct, None
 
 
 #------------------------------------------------------------------
@@ -146,11 +229,16 @@ class TypeExerciseGen(ExerciseGen):
     """Generate based on a set of exercise types"""
     def __init__(self, types: str | list[str]) -> None:
         self.types = types
+        # Resolve the classes once so that generating is only a pick
+        if isinstance(types, list):
+            classes = [_ALL_EXERCISES[ty] for ty in types]
+            self._pick = lambda: _choice(classes)
+        else:
+            cls = _ALL_EXERCISES[types]
+            self._pick = lambda: cls
 
     def get_an_exercise(self) -> Exercise:
-        ty = choice(self.types) if isinstance(self.types, list) else self.types
-        assert ty in _ALL_EXERCISES
-        return _ALL_EXERCISES[ty]()
+        return self._pick()()
 
 
 class ReprExerciseGen(ExerciseGen):
@@ -169,7 +257,7 @@ class ReprExerciseGen(ExerciseGen):
 
     def get_an_exercise(self) -> Exercise:
         if self.is_random:
-            ty, strrepr = choice(self.reprs)
+            ty, strrepr = _choice(self.reprs)
         else:
             ty, strrepr = self.reprs[self.idx]
             self.idx += 1
@@ -180,52 +268,85 @@ class ReprExerciseGen(ExerciseGen):
 
 class ExerciseSession:
     """Record a series of results of exercises"""
-    def __init__(self, data_dir: str) -> None:
-        """data_dir is the path to store all data files"""
+
+    __slots__ = ("data_dir", "count", "correct", "incorrect", "total_time",
+                 "_types", "_reprs", "_correct_flags", "_elapsed_ms", "date",
+                 "_sessions_path", "_exercises_path")
+
+    def __init__(self, data_dir: str, capacity: int = 0) -> None:
+        """data_dir is the path to store all data files
+
+        capacity is the expected number of exercises if known, the storage
+        of results is preallocated for it and grows beyond if needed
+        """
         self.data_dir = data_dir
+        self._sessions_path = os.path.join(data_dir, "_data", "sessions.csv")
+        self._exercises_path = os.path.join(data_dir, "_data",
+                                            "exercises.csv")
         self.count = 0
         self.correct = 0
         self.incorrect = 0
-        self.items = []
         self.total_time = 0
-        self.date = datetime.today().strftime("%Y-%m-%d")
+        # results of each exercise are stored column by column, only the
+        # first count items are valid, read them by _rows() or iter_items()
+        self._types: list[str | None] = [None] * capacity
+        self._reprs: list[str | None] = [None] * capacity
+        self._correct_flags = bytearray(capacity)
+        self._elapsed_ms = array("i", [0]) * capacity
+        # all the results share the session date
+        self.date = _today()
 
     def finish_an_exercise(self, ex: Exercise, correct: bool, ms_elapsed: int):
+        i = self.count
         self.count += 1
         self.total_time += ms_elapsed
         if correct:
             self.correct += 1
         else:
             self.incorrect += 1
-        self.items.append({
-            "type": ex.TYPE,
-            "repr": ex.get_repr(),
-            "correct": correct,
-            "ms_elapsed": ms_elapsed,
-            "date": self.date
-        })
+        if i < len(self._types):
+            self._types[i] = ex.TYPE
+            self._reprs[i] = ex.get_repr()
+            self._correct_flags[i] = correct
+            self._elapsed_ms[i] = ms_elapsed
+        else:
+            self._types.append(ex.TYPE)
+            self._reprs.append(ex.get_repr())
+            self._correct_flags.append(correct)
+            self._elapsed_ms.append(ms_elapsed)
+
+    def _rows(self):
+        """Iterate (type, repr, correct, ms_elapsed) of the recorded results"""
+        return islice(
+            zip(self._types, self._reprs, self._correct_flags,
+                self._elapsed_ms), self.count)
+
+    def iter_items(self):
+        """Yield the result of each exercise as a dict"""
+        for ty, strrepr, correct, ms_elapsed in self._rows():
+            yield {
+                "type": ty,
+                "repr": strrepr,
+                "correct": bool(correct),
+                "ms_elapsed": ms_elapsed,
+                "date": self.date
+            }
 
     def store_results(self) -> None:
         if self.count == 0:
             return
-        p = os.path.join(self.data_dir, "_data", "sessions.csv")
-        isnew = not os.path.exists(p)
-        with open(p, "a") as f:
-            if isnew:
-                f.write("date,duration_ms,count,correct,incorrect\n")
-            f.write(
-                f"{self.date},{self.total_time},{self.count},{self.correct},{self.incorrect}\n"
-            )
-
-        p = os.path.join(self.data_dir, "_data", "exercises.csv")
-        isnew = not os.path.exists(p)
-        with open(p, "a") as f:
-            if isnew:
-                f.write("type,repr,correct,ms_elapsed,date\n")
-            for x in self.items:
-                f.write(
-                    f"{x['type']},{x['repr']},{1 if x['correct'] else 0},{x['ms_elapsed']},{x['date']}\n"
-                )
+        _append_csv(
+            self._sessions_path, "date,duration_ms,count,correct,incorrect\n",
+            f"{self.date},{self.total_time},{self.count},{self.correct},{self.incorrect}\n"
+        )
+        # every row ends with the same date, so it is a constant suffix
+        suffix = f",{self.date}\n"
+        _append_csv(
+            self._exercises_path, "type,repr,correct,ms_elapsed,date\n",
+            "".join([
+                f"{ty},{strrepr},{correct},{ms_elapsed}{suffix}"
+                for ty, strrepr, correct, ms_elapsed in self._rows()
+            ]))
 
 
 #------------------------------------------------------------------
@@ -245,26 +366,58 @@ class TwoXTwoExercise(IntExercise):
 
     DESC = "A 2-digit integer times another 2-digit integer"
 
+    __slots__ = ("a", "b", "_str", "_repr")
+
     def __init__(self, strrepr=None) -> None:
         super().__init__(strrepr)
         if strrepr:
-            self.a, self.b = [int(x) for x in strrepr.split(",")]
+            self.a, self.b = map(int, strrepr.split(","))
         else:
             self.a = gen_math_int(2)
             self.b = gen_math_int(2)
 
         self.answer = self.a * self.b
+        self._str = f"{self.a} x {self.b} = ?"
+        self._repr = f"{self.a},{self.b}"
 
     def __str__(self) -> str:
-        return f"{self.a} x {self.b} = ?"
+        return self._str
 
     def get_repr(self) -> str:
-        return f"{self.a},{self.b}"
+        return self._repr
 
 
 register_exercise_type(TwoXTwoExercise)
 
 
+# The forms of a x b = c as (template, index of the answer in (a, b, c))
+_ONE_X_TWO_FORMS = (
+    ("{a} x {b} = ?", 2),
+    ("{b} x {a} = ?", 2),
+    ("{a} x ? = {c}", 1),
+    ("{b} x ? = {c}", 0),
+    ("? x {a} = {c}", 1),
+    ("? x {b} = {c}", 0),
+)
+
+
+def _one_x_two_form(a: int, b: int, form: int) -> tuple:
+    """A form of a x b as (a, b, c, repr, str, answer)"""
+    c = a * b
+    tmpl, answer = _ONE_X_TWO_FORMS[form]
+    return a, b, c, f"{a},{b}", tmpl.format(a=a, b=b, c=c), (a, b, c)[answer]
+
+
+# All the OneXTwoExercise exercises grouped by b, so that picking a group
+# then an item keeps b uniformly distributed
+_ONE_X_TWO_POOL = tuple(
+    tuple(
+        _one_x_two_form(a, b, form)
+        for a in (_valid_pool(1) if b < 20 else (2, 3))
+        for form in range(len(_ONE_X_TWO_FORMS)))
+    for b in _valid_pool(2, max=29))
+
+
 class OneXTwoExercise(IntExercise):
     """ a x b = c in which a is 1 digit and b is 2 digit is <39, and if 
     b is above 20, a will be only 2 or 3
@@ -276,31 +429,21 @@ class OneXTwoExercise(IntExercise):
 
     DESC = "A 2-digit integer times a single digit integer"
 
+    __slots__ = ("a", "b", "c", "ex_str", "_repr")
+
     def __init__(self, strrepr=None) -> None:
         super().__init__(strrepr)
         if strrepr:
-            a, b = [int(x) for x in strrepr.split(",")]
+            a, b = map(int, strrepr.split(","))
+            # only format the form that is picked
+            ex = _one_x_two_form(a, b, _RNG.randrange(len(_ONE_X_TWO_FORMS)))
         else:
-            b = gen_math_int(2, max=29)
-            if b < 20:
-                a = gen_math_int(1)
-            else:
-                a = choice([2, 3])
-        c = a * b
-
-        self.a, self.b, self.c = a, b, c
-
-        self.ex_str, self.answer = choice([
-            (f"{a} x {b} = ?", c),
-            (f"{b} x {a} = ?", c),
-            (f"{a} x ? = {c}", b),
-            (f"{b} x ? = {c}", a),
-            (f"? x {a} = {c}", b),
-            (f"? x {b} = {c}", a),
-        ])
+            ex = _choice(_choice(_ONE_X_TWO_POOL))
+
+        self.a, self.b, self.c, self._repr, self.ex_str, self.answer = ex
 
     def get_repr(self) -> str:
-        return f"{self.a},{self.b}"
+        return self._repr
 
     def __str__(self) -> str:
         return self.ex_str